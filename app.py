@@ -1,9 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from st_aggrid import AgGrid, GridOptionsBuilder
 import plotly.express as px
 import plotly.graph_objects as go
+import functools
+import hashlib
+import io
 import os
 import sqlite3
 from sqlite3 import Error
@@ -23,39 +29,132 @@ st.set_page_config(
 # DATA MANAGEMENT
 # ==============================================
 
-@st.cache_data(ttl=24*60*60)  # Refresh daily
-def load_database(db_path):
-    """Load and prepare the player data from SQLite database"""
+# On-disk Parquet snapshots of the players table, shared across sessions and worker processes
+PARQUET_CACHE_DIR = '.cache'
+
+# Specific columns renamed after standardization, for clarity and consistency (all lowercase)
+COLUMN_RENAMES = {
+    'player': 'player_name',
+    'market_value': 'market_value_eur',
+    'contract_expires': 'contract_expires_date',
+    'foot': 'preferred_foot',
+    'minutes_played': 'minutes_played_total',
+    'goals': 'goals_total',
+    'assists': 'assists_total',
+    'shots': 'shots_total',
+    'key_passes': 'key_passes_total',
+    'dribbles_per_90': 'dribbles_attempted_per_90',
+}
+
+# Columns converted to numeric (coercing errors, filling NaNs) after load
+NUMERIC_COLUMNS = [
+    'age', 'height', 'weight', 'market_value_eur',
+    'goals_total', 'xg', 'assists_total', 'xa',
+    'shots_total', 'shots_on_target_perc',
+    'dribbles_attempted_per_90', 'successful_dribbles_perc', 'touches_in_box_per_90', 'key_passes_total',
+    'passes_per_90', 'accurate_passes_per_90', 'pass_accuracy_perc',
+    'interceptions_per_90', 'tackles_per_90', 'shots_blocked_per_90', 'successful_defensive_actions_per_90',
+    'aerial_duels_won_perc', 'defensive_duels_won_perc',
+    'saves', 'clean_sheets', 'conceded_goals',
+    'minutes_played_total',
+    'progressive_runs_per_90'
+]
+
+# String columns that must exist for the filters and profiles
+ESSENTIAL_STR_COLUMNS = ['position', 'team', 'league', 'passport_country', 'preferred_foot']
+
+# Every source column the app reads; the per 90 metrics are derived after load
+LOADED_COLUMNS = {'player_name', 'contract_expires_date', *NUMERIC_COLUMNS, *ESSENTIAL_STR_COLUMNS}
+
+# Per 90 and percentage metrics offered as sidebar sliders and in the distribution charts
+ADVANCED_METRIC_COLUMNS = [
+    'goals_per_90', 'xg_per_90', 'assists_per_90', 'xa_per_90',
+    'shots_per_90', 'key_passes_per_90', 'dribbles_attempted_per_90',
+    'touches_in_box_per_90',
+    'pass_accuracy_perc', 'successful_dribbles_perc',
+    'interceptions_per_90', 'tackles_per_90', 'aerial_duels_won_perc', 'defensive_duels_won_perc',
+    'passes_per_90', 'progressive_runs_per_90'
+]
+
+# Metrics offered in the analytics tab's distribution chart, in menu order
+DISTRIBUTION_METRICS = ADVANCED_METRIC_COLUMNS + ['age', 'minutes_played_total', 'market_value_eur', 'height', 'weight']
+
+# Single-pass character mapping for column labels: ' ' -> '_', '%' -> '_perc', ',' dropped
+COLUMN_NAME_TABLE = str.maketrans({' ': '_', '%': '_perc', ',': None})
+
+def standardize_column_name(col):
+    """Standardize a raw column label: strip, snake_case, '%' -> '_perc', lowercase, then apply COLUMN_RENAMES"""
+    col = col.strip().translate(COLUMN_NAME_TABLE).replace('__', '_').lower()
+    return COLUMN_RENAMES.get(col, col)
+
+@functools.lru_cache(maxsize=None)
+def metric_label(metric):
+    """Display label for a metric column: 'xg_per_90' -> 'xg /90', 'pass_accuracy_perc' -> 'pass accuracy %'"""
+    return metric.replace('_', ' ').replace('perc', '%').replace('per 90', '/90')
+
+# Arrow-backed pandas string dtype (NaN as the missing value, like pandas' "str")
+ARROW_STRING_TYPES = {
+    pa.string(): pd.StringDtype('pyarrow', na_value=np.nan),
+    pa.large_string(): pd.StringDtype('pyarrow', na_value=np.nan),
+}
+
+# Rows without a player name are useless to every view; SQLite drops them before they reach Python
+PLAYERS_QUERY = """SELECT * FROM players WHERE "Player" IS NOT NULL AND TRIM("Player") <> ''"""
+
+def read_players_table(db_path, usecols=None):
+    """Read the raw players table, going through a Parquet snapshot keyed by the database file hash and query.
+
+    usecols is an optional predicate on raw column labels; only matching columns are read
+    back from the snapshot, so unused columns are never materialized.
+    """
+    file_hash = hashlib.md5(PLAYERS_QUERY.encode())
+    with open(db_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            file_hash.update(chunk)
+    cache_path = os.path.join(PARQUET_CACHE_DIR, f"players_{file_hash.hexdigest()}.parquet")
+
+    if os.path.exists(cache_path):
+        columns = pq.read_schema(cache_path).names
+        if usecols is not None:
+            columns = [col for col in columns if usecols(col)]
+        # Text columns stay contiguous Arrow string arrays instead of boxed Python objects
+        table = pq.read_table(cache_path, columns=columns)
+        return table.to_pandas(types_mapper=ARROW_STRING_TYPES.get)
+
+    # Connect to SQLite database and read the named players (assuming the table is named 'players')
+    conn = sqlite3.connect(db_path)
     try:
-        # Connect to SQLite database
-        conn = sqlite3.connect(db_path)
-        
-        # Read the entire table (assuming it's named 'players')
-        df = pd.read_sql_query("SELECT * FROM players", conn)
-        
-        # Close the connection
+        df = pd.read_sql_query(PLAYERS_QUERY, conn)
+    finally:
         conn.close()
 
+    # Write to a temporary file first so concurrent sessions never read a partial snapshot
+    try:
+        os.makedirs(PARQUET_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pa.ArrowException):
+        # The snapshot is only an optimization; keep serving straight from SQLite
+        pass
+
+    if usecols is not None:
+        df = df[[col for col in df.columns if usecols(col)]]
+    return df
+
+@st.cache_data(ttl=24*60*60)  # Refresh daily
+def load_database(db_path, db_mtime):
+    """Load and prepare the player data from SQLite database.
+
+    db_mtime is not read here; it is part of the cache key so that replacing
+    the database file invalidates the cached DataFrame before the daily TTL.
+    """
+    try:
+        # Read only the columns the app uses (from the Parquet snapshot when one exists for this file)
+        df = read_players_table(db_path, usecols=lambda col: standardize_column_name(col) in LOADED_COLUMNS)
+
         # Standardize column names: strip spaces, replace spaces with underscores, handle special chars, convert to lowercase
-        df.columns = df.columns.str.strip().str.replace(' ', '_').str.replace('%', '_perc').str.replace(',', '').str.replace('__', '_').str.lower()
-
-        # Rename specific columns for clarity and consistency (all lowercase now)
-        df = df.rename(columns={
-            'player': 'player_name',
-            'market_value': 'market_value_eur',
-            'contract_expires': 'contract_expires_date',
-            'birth_country': 'passport_country',
-            'foot': 'preferred_foot',
-            'minutes_played': 'minutes_played_total',
-            'goals': 'goals_total',
-            'assists': 'assists_total',
-            'shots': 'shots_total',
-            'key_passes': 'key_passes_total',
-            'dribbles_per_90': 'dribbles_attempted_per_90',
-        })
-
-        # Drop rows where 'player_name' is entirely NaN
-        df = df.dropna(subset=['player_name'], how='all')
+        df.columns = [standardize_column_name(col) for col in df.columns]
 
         # Convert 'contract_expires_date' to datetime and extract year
         if 'contract_expires_date' in df.columns:
@@ -64,28 +163,14 @@ def load_database(db_path):
         else:
             df['contract_expires_year'] = 2100
 
-        # Convert relevant columns to numeric, coercing errors and filling NaNs
-        numeric_cols_to_process = [
-            'age', 'height', 'weight', 'market_value_eur',
-            'goals_total', 'xg', 'assists_total', 'xa',
-            'shots_total', 'shots_on_target_perc',
-            'dribbles_attempted_per_90', 'successful_dribbles_perc', 'touches_in_box_per_90', 'key_passes_total',
-            'passes_per_90', 'accurate_passes_per_90', 'pass_accuracy_perc',
-            'interceptions_per_90', 'tackles_per_90', 'shots_blocked_per_90', 'successful_defensive_actions_per_90',
-            'aerial_duels_won_perc', 'defensive_duels_won_perc',
-            'saves', 'clean_sheets', 'conceded_goals',
-            'minutes_played_total',
-            'progressive_runs_per_90'
-        ]
-
-        for col in numeric_cols_to_process:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-            else:
+        # Convert relevant columns to numeric, coercing errors and filling NaNs, in one batched call
+        present_numeric = [col for col in NUMERIC_COLUMNS if col in df.columns]
+        df[present_numeric] = df[present_numeric].apply(pd.to_numeric, errors='coerce').fillna(0)
+        for col in NUMERIC_COLUMNS:
+            if col not in df.columns:
                 df[col] = 0
 
         # Calculate per 90 metrics (using 'minutes_played_total')
-        minutes_condition = df['minutes_played_total'] > 0
         metrics_for_per90_conversion = {
             'goals_total': 'goals_per_90',
             'xg': 'xg_per_90',
@@ -95,24 +180,38 @@ def load_database(db_path):
             'key_passes_total': 'key_passes_per_90',
         }
 
+        # All base metrics are divided in one 2D pass; rows without minutes stay 0
+        present_metrics = [metric for metric in metrics_for_per90_conversion if metric in df.columns]
+        minutes = df['minutes_played_total'].to_numpy(dtype=np.float64)[:, np.newaxis]
+        per90 = np.zeros((len(df), len(present_metrics)))
+        np.divide(df[present_metrics].to_numpy(dtype=np.float64), minutes, out=per90, where=minutes > 0)
+        per90 *= 90
         for base_metric, new_per90_col in metrics_for_per90_conversion.items():
             if base_metric in df.columns:
-                df[new_per90_col] = np.where(
-                    minutes_condition,
-                    (df[base_metric] / df['minutes_played_total']) * 90,
-                    0
-                )
+                df[new_per90_col] = per90[:, present_metrics.index(base_metric)]
             else:
                 df[new_per90_col] = 0
 
+        # Narrow the numeric dtypes once (age -> uint8, minutes -> uint16, xG and rates -> float32);
+        # narrower columns mean fewer bytes per filter scan and groupby. Whole-number columns stored
+        # as REAL (e.g. age) become integers too; per 90 rates and percentages stay floating point.
+        for col in df.select_dtypes(include='number').columns:
+            if pd.api.types.is_integer_dtype(df[col]) or not col.endswith(('_per_90', '_perc')):
+                df[col] = pd.to_numeric(df[col], downcast='unsigned' if df[col].min() >= 0 else 'integer')
+        float_cols = df.select_dtypes(include='float').columns
+        df[float_cols] = df[float_cols].astype('float32')
+
         # Ensure essential columns exist after all processing
-        essential_str_cols = ['position', 'team', 'league', 'Passport country', 'preferred_foot']
-        for col in essential_str_cols:
+        for col in ESSENTIAL_STR_COLUMNS:
             if col not in df.columns:
                 df[col] = 'Unknown'
             else:
                 df[col] = df[col].fillna('Unknown').astype(str)
 
+        # The string columns repeat heavily across rows; categorical codes make isin/unique/groupby integer work
+        for col in ESSENTIAL_STR_COLUMNS:
+            df[col] = df[col].astype('category')
+
         return df
 
     except Error as e:
@@ -122,19 +221,455 @@ def load_database(db_path):
         st.error(f"An error occurred while loading or processing the data: {str(e)}")
         st.stop()
 
+@st.cache_data(ttl=24*60*60)
+def get_filter_options(db_path, db_mtime):
+    """Compute the sidebar filter choices and slider bounds once per database version"""
+    df = load_database(db_path, db_mtime)
+
+    # One min/max aggregation over every slider column; bounds absent from it come back as None
+    bound_columns = ['age', 'minutes_played_total', 'contract_expires_year', 'market_value_eur', *ADVANCED_METRIC_COLUMNS]
+    present = [col for col in bound_columns if col in df.columns and pd.api.types.is_numeric_dtype(df[col])]
+    stats = df[present].agg(['min', 'max']) if present and not df.empty else pd.DataFrame()
+
+    def int_bounds(col):
+        if col not in stats.columns:
+            return None
+        return int(stats.at['min', col]), int(stats.at['max', col])
+
+    def float_bounds(cols):
+        return {
+            col: (float(stats.at['min', col]), float(stats.at['max', col])) if col in stats.columns else None
+            for col in cols
+        }
+
+    def sorted_choices(col):
+        # Categorical columns already hold their sorted distinct values; skip the row scan
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            return df[col].cat.categories.tolist()
+        return sorted(df[col].dropna().unique())
+
+    numeric_columns = df.select_dtypes(include='number').columns.tolist()
+
+    return {
+        'positions': sorted_choices('position'),
+        'teams': sorted_choices('team'),
+        'leagues': sorted_choices('league'),
+        'nationalities': sorted_choices('passport_country'),
+        'preferred_feet': sorted_choices('preferred_foot'),
+        'age_bounds': int_bounds('age'),
+        'minutes_bounds': int_bounds('minutes_played_total'),
+        'contract_year_bounds': int_bounds('contract_expires_year'),
+        'market_value_bounds': int_bounds('market_value_eur'),
+        'metric_bounds': float_bounds(ADVANCED_METRIC_COLUMNS),
+        'numeric_columns': numeric_columns,
+        # Distribution menu: metric -> display label, in DISTRIBUTION_METRICS order
+        'distribution_labels': {
+            m: metric_label(m)
+            for m in DISTRIBUTION_METRICS if m in numeric_columns
+        },
+    }
+
+# Range-filter columns answered by binary search over a pre-sorted copy
+SORTED_RANGE_COLUMNS = ['age', 'minutes_played_total']
+
+@st.cache_data(ttl=24*60*60)
+def get_range_index(db_path, db_mtime):
+    """Sort the main range-filter columns once per database version: {col: (sorted values, row order)}"""
+    df = load_database(db_path, db_mtime)
+    range_index = {}
+    for col in SORTED_RANGE_COLUMNS:
+        if col in df.columns:
+            values = df[col].to_numpy()
+            order = np.argsort(values, kind='stable')
+            range_index[col] = (values[order], order)
+    return range_index
+
+@st.cache_data(ttl=24*60*60, max_entries=32, show_spinner=False)
+def get_filtered_positions(db_path, db_mtime, active_filters):
+    """Row positions of df matching the active filters; cached per filter state and database version"""
+    df = load_database(db_path, db_mtime)
+    range_index = get_range_index(db_path, db_mtime)
+    filter_options = get_filter_options(db_path, db_mtime)
+    column_bounds = dict(filter_options['metric_bounds'])
+    for filter_key, col in RANGE_FILTER_COLUMNS.items():
+        column_bounds[col] = filter_options[filter_key.replace('_range', '_bounds')]
+    return np.flatnonzero(build_filter_mask(df, active_filters, range_index, column_bounds))
+
+@st.cache_data(ttl=24*60*60, show_spinner=False)
+def get_sort_order(db_path, db_mtime, sort_by, ascending):
+    """Row positions of df in sort order for one column and direction, computed once per database version"""
+    df = load_database(db_path, db_mtime)
+    values = df[sort_by].reset_index(drop=True)
+    return values.sort_values(ascending=ascending, kind='stable').index.to_numpy()
+
+# Per 90 metrics compared on the player profile radar chart
+RADAR_METRICS = [
+    'goals_per_90', 'xg_per_90', 'assists_per_90', 'xa_per_90',
+    'shots_per_90', 'key_passes_per_90', 'dribbles_attempted_per_90',
+    'interceptions_per_90', 'tackles_per_90', 'aerial_duels_won_perc'
+]
+
+@st.cache_data(ttl=24*60*60, max_entries=32, show_spinner=False)
+def get_position_radar_stats(db_path, db_mtime, active_filters, radar_metrics):
+    """Mean and max of radar_metrics per position over the filtered rows: {position: (means, maxima)}"""
+    df = load_database(db_path, db_mtime)
+    if active_filters:
+        df = df.iloc[get_filtered_positions(db_path, db_mtime, active_filters)]
+    if not radar_metrics:
+        return dict.fromkeys(df['position'].unique(), None)
+    grouped = df.groupby('position', observed=True)[list(radar_metrics)]
+    means, maxima = grouped.mean(), grouped.max()
+    return {
+        position: (mean_row, max_row)
+        for position, mean_row, max_row in zip(
+            means.index, means.to_numpy(dtype=np.float64), maxima.to_numpy(dtype=np.float64)
+        )
+    }
+
+# Largest marker diameter (px) in the scatter plot when sized by market value
+SCATTER_MAX_MARKER_SIZE = 20
+
+# Above this many rows the scatter plot is drawn as a binned density heatmap instead of points
+SCATTER_DENSITY_THRESHOLD = 5000
+SCATTER_DENSITY_BINS = (120, 80)
+
+# Above this many rows (and up to the density threshold) the scatter plot draws a stratified sample
+SCATTER_SAMPLE_SIZE = 2000
+
+@st.cache_data(ttl=24*60*60, max_entries=32, show_spinner=False)
+def build_scatter_figure(db_path, db_mtime, active_filters, x_metric, y_metric, x_label, y_label):
+    """Scatter of two metrics over the filtered rows, one WebGL trace per position.
+
+    Past SCATTER_DENSITY_THRESHOLD rows the points are binned with np.histogram2d and drawn
+    as a heatmap, so the browser renders a fixed grid of cells instead of every player.
+    """
+    df = load_database(db_path, db_mtime)
+    if active_filters:
+        df = df.iloc[get_filtered_positions(db_path, db_mtime, active_filters)]
+
+    if len(df) > SCATTER_DENSITY_THRESHOLD:
+        counts, x_edges, y_edges = np.histogram2d(
+            df[x_metric].to_numpy(dtype=np.float64), df[y_metric].to_numpy(dtype=np.float64),
+            bins=SCATTER_DENSITY_BINS
+        )
+        fig = go.Figure(go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+            z=np.where(counts > 0, counts, np.nan).T, colorscale='Blues', colorbar_title='players',
+            hovertemplate=f'{x_label}=%{{x}}<br>{y_label}=%{{y}}<br>players=%{{z}}<extra></extra>'
+        ))
+        fig.update_layout(title=f'{x_label} vs. {y_label} (density)', xaxis_title=x_label, yaxis_title=y_label)
+        return fig
+
+    hover = df[['player_name', 'team', 'position', 'age', 'minutes_played_total', 'market_value_eur']].astype(str).to_numpy()
+    hover_template = (
+        '<b>%{customdata[0]}</b><br>team=%{customdata[1]}<br>position=%{customdata[2]}'
+        '<br>age=%{customdata[3]}<br>minutes=%{customdata[4]}<br>market value=%{customdata[5]}'
+        f'<br>{x_label}=%{{x}}<br>{y_label}=%{{y}}<extra></extra>'
+    )
+    sizes = df['market_value_eur'].to_numpy(dtype=np.float64)
+    size_ref = 2.0 * sizes.max() / SCATTER_MAX_MARKER_SIZE ** 2 if len(sizes) and sizes.max() > 0 else None
+
+    # Split the rows by position code with one stable sort instead of a groupby per trace
+    codes = df['position'].cat.codes.to_numpy()
+    order = np.argsort(codes, kind='stable')
+    groups = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1)
+    categories = df['position'].cat.categories
+
+    # Each position keeps its share of the sample, and at least one player, so no position disappears
+    if len(df) > SCATTER_SAMPLE_SIZE:
+        rng = np.random.default_rng(0)
+        fraction = SCATTER_SAMPLE_SIZE / len(df)
+        groups = [np.sort(rng.choice(rows, max(1, round(len(rows) * fraction)), replace=False)) for rows in groups]
+    x_values, y_values = df[x_metric].to_numpy(), df[y_metric].to_numpy()
+
+    fig = go.Figure(data=[
+        go.Scattergl(
+            x=x_values[rows], y=y_values[rows], mode='markers', name=categories[codes[rows[0]]],
+            customdata=hover[rows], hovertemplate=hover_template,
+            marker=dict(size=sizes[rows], sizemode='area', sizeref=size_ref) if size_ref else None
+        )
+        for rows in groups if len(rows)
+    ])
+    fig.update_layout(
+        title=f'{x_label} vs. {y_label}', xaxis_title=x_label, yaxis_title=y_label,
+        legend_title_text='position'
+    )
+    return fig
+
 # ==============================================
 # UTILITY FUNCTIONS
 # ==============================================
 
-def safe_mean(series, format_str=".2f"):
-    """Safely calculate mean with formatting, handling missing columns and non-numeric data"""
-    if series is None or series.empty or not pd.api.types.is_numeric_dtype(series) or series.isnull().all():
-        return "N/A"
-    mean_val = series.mean()
-    if pd.isna(mean_val):
+# Columns averaged in the results summary
+SUMMARY_COLUMNS = ['age', 'minutes_played_total', 'goals_per_90', 'xg_per_90', 'assists_per_90', 'xa_per_90']
+
+def summary_means(df):
+    """Mean of every numeric SUMMARY_COLUMNS column in one aggregation pass"""
+    present = [col for col in SUMMARY_COLUMNS if col in df.columns and pd.api.types.is_numeric_dtype(df[col])]
+    return df[present].mean()
+
+@st.cache_data(ttl=24*60*60, max_entries=32, show_spinner=False)
+def get_summary_means(db_path, db_mtime, active_filters):
+    """summary_means over the filtered rows as a dict, cached per filter state and database version"""
+    df = load_database(db_path, db_mtime)
+    if active_filters:
+        df = df.iloc[get_filtered_positions(db_path, db_mtime, active_filters)]
+    return summary_means(df).to_dict()
+
+# League overview bar charts: column -> aggregation per league
+LEAGUE_AGG_METRICS = {
+    'age': 'mean',
+    'goals_per_90': 'mean',
+    'assists_per_90': 'mean',
+    'xg_per_90': 'mean',
+    'xa_per_90': 'mean',
+    'pass_accuracy_perc': 'mean',
+    'successful_dribbles_perc': 'mean',
+    'interceptions_per_90': 'mean',
+    'tackles_per_90': 'mean'
+}
+
+@st.cache_data(ttl=24*60*60, max_entries=32, show_spinner=False)
+def get_league_stats(db_path, db_mtime, active_filters):
+    """Per-league LEAGUE_AGG_METRICS over the filtered rows, or None when no metric is present"""
+    df = load_database(db_path, db_mtime)
+    if active_filters:
+        df = df.iloc[get_filtered_positions(db_path, db_mtime, active_filters)]
+    existing_agg_metrics = {k: v for k, v in LEAGUE_AGG_METRICS.items() if k in df.columns}
+    if not existing_agg_metrics:
+        return None
+    # Only leagues present in the filtered rows; the bar charts order the groups themselves
+    return df.groupby('league', observed=True, sort=False).agg(existing_agg_metrics).reset_index()
+
+def safe_mean(means, col, format_str=".2f"):
+    """Format a precomputed mean, handling missing columns and empty selections"""
+    mean_val = means.get(col)
+    if mean_val is None or pd.isna(mean_val):
         return "N/A"
     return f"{mean_val:{format_str}}"
 
+@st.cache_data(ttl=24*60*60, show_spinner=False)
+def get_export_table(db_path, db_mtime):
+    """Every column of the players table for the downloads, with the app's cleaned and derived columns laid over it.
+
+    load_database reads only LOADED_COLUMNS; the export reads the full snapshot so the raw
+    columns the app never uses are not lost. Rows line up with load_database, whose
+    RangeIndex gives each row's position.
+    """
+    export = read_players_table(db_path)
+    export.columns = [standardize_column_name(col) for col in export.columns]
+    df = load_database(db_path, db_mtime)
+    loaded = [col for col in df.columns if col in export.columns]
+    export[loaded] = df[loaded]
+    return pd.concat([export, df[[col for col in df.columns if col not in export.columns]]], axis=1)
+
+@st.cache_data(show_spinner=False)
+def to_csv_bytes(df):
+    """Encode a DataFrame as UTF-8 CSV bytes using pyarrow's multi-threaded CSV writer"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # The contract date is day precision; write it as a plain date like DataFrame.to_csv did
+    if 'contract_expires_date' in table.column_names:
+        date_index = table.schema.get_field_index('contract_expires_date')
+        table = table.set_column(date_index, 'contract_expires_date', table['contract_expires_date'].cast(pa.date32()))
+    buffer = io.BytesIO()
+    pa_csv.write_csv(table, buffer)
+    return buffer.getvalue()
+
+@st.cache_data(show_spinner=False)
+def to_parquet_bytes(df):
+    """Encode a DataFrame as zstd-compressed Parquet bytes; no text conversion and a much smaller file than CSV"""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, engine='pyarrow', compression='zstd', index=False)
+    return buffer.getvalue()
+
+@st.cache_resource(show_spinner=False)
+def build_grid_options(schema_df):
+    """Build the player grid options once; they depend only on the column names and dtypes of schema_df (a zero-row frame)"""
+    gb = GridOptionsBuilder.from_dataframe(schema_df)
+
+    gb.configure_default_column(
+        groupable=True, sortable=True, resizable=True, filterable=True,
+        editable=False, wrapText=True, width=150
+    )
+    gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=25)
+
+    # valueFormatter strings are AG Grid expressions: compiled once in the browser, run only for
+    # the cells on screen, and the columns stay numeric for in-grid sorting and filtering
+    for col_name in schema_df.columns:
+        header_name = metric_label(col_name).replace('total', '(Total)')
+        if col_name.endswith('_per_90') or col_name in ['xg', 'xa', 'shots_per_90']:
+            gb.configure_column(col_name, type=["numericColumn", "numberColumnFilter"],
+                                valueFormatter="value != null ? value.toFixed(2) : 'N/A'",
+                                headerName=header_name)
+        elif col_name.endswith('_perc'):
+            gb.configure_column(col_name, type=["numericColumn", "numberColumnFilter"],
+                                valueFormatter="value != null ? value.toFixed(1) + '%' : 'N/A'",
+                                headerName=header_name)
+        elif col_name == 'market_value_eur':
+            gb.configure_column(col_name, type=["numericColumn", "numberColumnFilter"],
+                                valueFormatter="value != null ? '€' + value.toLocaleString() : 'N/A'",
+                                headerName="Market Value (€)")
+        elif col_name in ['player_name', 'position', 'team', 'league', 'passport_country', 'preferred_foot']:
+            gb.configure_column(col_name, headerName=header_name, width=150, sortable=True, filterable=True)
+        elif col_name in ['age', 'minutes_played_total', 'goals_total', 'assists_total', 'height', 'weight', 'contract_expires_year']:
+            gb.configure_column(col_name, type=["numericColumn", "numberColumnFilter"],
+                                valueFormatter="value != null ? Math.round(value) : 'N/A'",
+                                headerName=header_name)
+        else:
+            gb.configure_column(col_name, headerName=header_name)
+
+    gb.configure_selection('single', use_checkbox=True, groupSelectsChildren=True)
+    return gb.build()
+
+# Largest number of players drawn in the distribution chart's rug
+RUG_SAMPLE_SIZE = 500
+
+# Sidebar multiselect filters: filters-dict key -> column
+CATEGORY_FILTER_COLUMNS = {
+    'positions': 'position',
+    'teams': 'team',
+    'leagues': 'league',
+    'nationalities': 'passport_country',
+    'preferred_foot': 'preferred_foot',
+}
+
+# Sidebar range sliders: filters-dict key -> column
+RANGE_FILTER_COLUMNS = {
+    'age_range': 'age',
+    'minutes_range': 'minutes_played_total',
+    'contract_year_range': 'contract_expires_year',
+    'market_value_range': 'market_value_eur',
+}
+
+def get_active_filters(filters, slider_defaults):
+    """Keep only the filters that restrict rows: non-empty multiselects and sliders moved off their initial range"""
+    active = {key: filters[key] for key in CATEGORY_FILTER_COLUMNS if filters.get(key)}
+    active.update({
+        key: filters[key] for key in RANGE_FILTER_COLUMNS
+        if filters.get(key) and filters[key] != slider_defaults.get(key)
+    })
+    metric_defaults = slider_defaults.get('metric_ranges', {})
+    metric_ranges = {
+        metric: values for metric, values in filters.get('metric_ranges', {}).items()
+        if values != metric_defaults.get(metric)
+    }
+    if metric_ranges:
+        active['metric_ranges'] = metric_ranges
+    return active
+
+def isin_mask(series, selected):
+    """Boolean array of the rows whose value is one of the selected options"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Compare the integer category codes against the few selected codes;
+        # options missing from the categories (-1) must not match NaN rows
+        wanted = series.cat.categories.get_indexer(selected)
+        return np.isin(series.cat.codes.to_numpy(), wanted[wanted >= 0])
+    return series.isin(pd.Index(selected)).to_numpy()
+
+def build_filter_mask(df, filters, range_index=None, column_bounds=None):
+    """Combine every active sidebar filter into a single boolean row mask over df.
+
+    range_index (from get_range_index, built on the same df) lets range filters on
+    pre-sorted columns locate their rows with two binary searches instead of comparisons.
+    column_bounds ({col: (min, max)} of df) lets range bounds outside the data skip their comparison.
+    """
+    range_index = range_index or {}
+    column_bounds = column_bounds or {}
+    mask = np.ones(len(df), dtype=bool)
+
+    # The selective multiselect filters go first; once no row survives, the remaining
+    # predicates cannot change the result, so stop scanning columns
+    for filter_key, col in CATEGORY_FILTER_COLUMNS.items():
+        if filters.get(filter_key) and col in df.columns:
+            mask &= isin_mask(df[col], filters[filter_key])
+            if not mask.any():
+                return mask
+
+    range_filters = [
+        (col, filters[filter_key]) for filter_key, col in RANGE_FILTER_COLUMNS.items()
+        if filters.get(filter_key)
+    ]
+    range_filters += list(filters.get('metric_ranges', {}).items())
+
+    # Evaluate the range predicates into one reusable scratch buffer so each
+    # bound costs a single pass over the column and no temporary arrays
+    scratch = np.empty(len(df), dtype=bool)
+    for col, (min_val, max_val) in range_filters:
+        if col in range_index:
+            sorted_values, order = range_index[col]
+            start = np.searchsorted(sorted_values, min_val, side='left')
+            stop = np.searchsorted(sorted_values, max_val, side='right')
+            if start == 0 and stop == len(order):
+                continue  # The range covers every row
+            # Touch whichever is smaller: the rows inside the range or the rows outside it
+            if stop - start <= len(order) // 2:
+                scratch.fill(False)
+                scratch[order[start:stop]] = True
+            else:
+                scratch.fill(True)
+                scratch[order[:start]] = False
+                scratch[order[stop:]] = False
+            mask &= scratch
+            if not mask.any():
+                return mask
+        elif col in df.columns:
+            # A bound at or beyond the column's own min/max excludes nothing
+            col_min, col_max = column_bounds.get(col) or (None, None)
+            values = df[col].to_numpy()
+            if col_min is None or min_val > col_min:
+                np.greater_equal(values, min_val, out=scratch)
+                mask &= scratch
+            if col_max is None or max_val < col_max:
+                np.less_equal(values, max_val, out=scratch)
+                mask &= scratch
+            if not mask.any():
+                return mask
+
+    return mask
+
+@st.fragment
+def render_scatter_panel(filtered_df, db_path, db_mtime, active_filters):
+    """Scatter plot section; changing its axis selectboxes reruns only this fragment"""
+    st.subheader("Player Comparison Scatter Plot")
+    st.write("Identify player archetypes by comparing two key performance metrics.")
+
+    col_x, col_y = st.columns(2)
+    numeric_columns = get_filter_options(db_path, db_mtime)['numeric_columns']
+    scatter_options = [
+        m for m in ADVANCED_METRIC_COLUMNS + ['pass_accuracy_perc', 'successful_dribbles_perc', 'age', 'minutes_played_total', 'market_value_eur', 'height', 'weight']
+        if m in numeric_columns
+    ]
+
+    display_scatter_options = [metric_label(opt) for opt in scatter_options]
+
+    x_axis_metric_display = col_x.selectbox(
+        "X-Axis Metric:",
+        options=display_scatter_options,
+        index=display_scatter_options.index('xg /90') if 'xg /90' in display_scatter_options else 0,
+        key='x_axis_metric'
+    )
+    y_axis_metric_display = col_y.selectbox(
+        "Y-Axis Metric:",
+        options=display_scatter_options,
+        index=display_scatter_options.index('xa /90') if 'xa /90' in display_scatter_options else (1 if len(display_scatter_options)>1 else 0),
+        key='y_axis_metric'
+    )
+    x_axis_metric = scatter_options[display_scatter_options.index(x_axis_metric_display)]
+    y_axis_metric = scatter_options[display_scatter_options.index(y_axis_metric_display)]
+
+    if x_axis_metric and y_axis_metric and not filtered_df.empty:
+        fig_scatter = build_scatter_figure(
+            db_path, db_mtime, active_filters, x_axis_metric, y_axis_metric,
+            x_axis_metric_display, y_axis_metric_display
+        )
+        st.plotly_chart(fig_scatter, use_container_width=True)
+        if len(filtered_df) > SCATTER_DENSITY_THRESHOLD:
+            st.caption(f"Showing player density for {len(filtered_df)} players; narrow the filters to {SCATTER_DENSITY_THRESHOLD} or fewer to see individual players.")
+        elif len(filtered_df) > SCATTER_SAMPLE_SIZE:
+            st.caption(f"Showing a per-position sample of about {SCATTER_SAMPLE_SIZE} of {len(filtered_df)} players.")
+    else:
+        st.info("Select two numeric metrics for the scatter plot.")
+
 # ==============================================
 # MAIN APP
 # ==============================================
@@ -147,9 +682,10 @@ def main():
         st.error(f"The required database file '{db_file_path}' was not found. Please ensure it's in the same directory.")
         st.stop()
 
-    # Load data with progress indicator
+    # Load data with progress indicator (cached per database file version)
+    db_mtime = os.path.getmtime(db_file_path)
     with st.spinner("Loading and processing player data from database..."):
-        df = load_database(db_file_path)
+        df = load_database(db_file_path, db_mtime)
 
     if df.empty:
         st.warning("No player data available after loading. Please check the database file and processing steps.")
@@ -162,142 +698,148 @@ def main():
     st.sidebar.title("🔍 Advanced Filters")
     st.sidebar.markdown("---")
 
-    # Dynamic filter options based on available data
-    positions = sorted(df['position'].dropna().unique())
-    teams = sorted(df['team'].dropna().unique())
-    leagues = sorted(df['league'].dropna().unique())
-    nationalities = sorted(df['Passport country'].dropna().unique())
-    preferred_feet = sorted(df['preferred_foot'].dropna().unique())
-
-    selected_positions = st.sidebar.multiselect(
-        "Positions",
-        positions,
-        default=[],
-        help="Select one or more playing positions (e.g., CB, CM, ST)."
-    )
-
-    selected_teams = st.sidebar.multiselect(
-        "Teams",
-        teams,
-        default=[],
-        help="Filter players by their current club team."
-    )
-
-    selected_leagues = st.sidebar.multiselect(
-        "Leagues",
-        leagues,
-        default=[],
-        help="Filter players by the competition they currently play in."
-    )
-
-    selected_nationalities = st.sidebar.multiselect(
-        "Nationalities",
-        nationalities,
-        default=[],
-        help="Filter players by their passport country."
-    )
-
-    selected_foot = st.sidebar.multiselect(
-        "Preferred Foot",
-        preferred_feet,
-        default=[],
-        help="Filter by the player's preferred foot (left, right, both)."
-    )
-
-    # Age filter
-    min_age_val, max_age_val = int(df['age'].min()), int(df['age'].max())
-    age_range = st.sidebar.slider(
-        "Age Range",
-        min_age_val, max_age_val,
-        (min_age_val, max_age_val),
-        help="Filter players by their age."
-    )
-
-    # Minutes played filter
-    min_minutes, max_minutes = 0, 0
-    if 'minutes_played_total' in df.columns and not df['minutes_played_total'].empty:
-        min_minutes, max_minutes = int(df['minutes_played_total'].min()), int(df['minutes_played_total'].max())
-        minutes_range = st.sidebar.slider(
-            "Minutes Played (Season)",
-            min_minutes, max_minutes,
-            (min_minutes, max_minutes),
-            help="Filter players by total minutes played in the season."
+    # Dynamic filter options based on available data (cached per database version)
+    filter_options = get_filter_options(db_file_path, db_mtime)
+    positions = filter_options['positions']
+    teams = filter_options['teams']
+    leagues = filter_options['leagues']
+    nationalities = filter_options['nationalities']
+    preferred_feet = filter_options['preferred_feet']
+    numeric_columns = filter_options['numeric_columns']
+
+    # Filters are collected in a form so dragging a slider or editing a multiselect
+    # does not rerun the app; everything is applied together on submit
+    slider_defaults = {'metric_ranges': {}}  # initial range of each slider, i.e. "no filter"
+    with st.sidebar.form("filters_form"):
+        selected_positions = st.multiselect(
+            "Positions",
+            positions,
+            default=[],
+            help="Select one or more playing positions (e.g., CB, CM, ST)."
         )
-    else:
-        minutes_range = (0, 0)
-        st.sidebar.info("Minutes Played data not available.")
-
-    # Contract Expiration Filter
-    if 'contract_expires_year' in df.columns and not df['contract_expires_year'].empty:
-        min_contract_year, max_contract_year = int(df['contract_expires_year'].min()), int(df['contract_expires_year'].max())
-        contract_year_range = st.sidebar.slider(
-            "Contract Expiration Year",
-            min_contract_year, max_contract_year,
-            (min_contract_year, max_contract_year),
-            help="Filter players by the year their contract expires."
+
+        selected_teams = st.multiselect(
+            "Teams",
+            teams,
+            default=[],
+            help="Filter players by their current club team."
         )
-    else:
-        contract_year_range = (0, 0)
-        st.sidebar.info("Contract Expiration data not available.")
-
-    # Market Value Filter
-    if 'market_value_eur' in df.columns and not df['market_value_eur'].empty:
-        slider_max_value = max(int(df['market_value_eur'].max() * 1.2), 1000000)
-        min_value, max_value = int(df['market_value_eur'].min()), int(df['market_value_eur'].max())
-
-        market_value_range = st.sidebar.slider(
-            "Market Value (€)",
-            0, slider_max_value,
-            (min_value, max_value),
-            format="€%d",
-            help="Filter players by their estimated market value in Euros."
+
+        selected_leagues = st.multiselect(
+            "Leagues",
+            leagues,
+            default=[],
+            help="Filter players by the competition they currently play in."
         )
-    else:
-        market_value_range = (0, 0)
-        st.sidebar.info("Market Value data not available.")
 
-    # Performance Metric filters
-    st.sidebar.markdown("### Performance Metrics (per 90 & Percentages)")
-    metric_ranges = {}
+        selected_nationalities = st.multiselect(
+            "Nationalities",
+            nationalities,
+            default=[],
+            help="Filter players by their passport country."
+        )
 
-    advanced_metric_columns = [
-        'goals_per_90', 'xg_per_90', 'assists_per_90', 'xa_per_90',
-        'shots_per_90', 'key_passes_per_90', 'dribbles_attempted_per_90',
-        'touches_in_box_per_90',
-        'pass_accuracy_perc', 'successful_dribbles_perc',
-        'interceptions_per_90', 'tackles_per_90', 'aerial_duels_won_perc', 'defensive_duels_won_perc',
-        'passes_per_90', 'progressive_runs_per_90'
-    ]
+        selected_foot = st.multiselect(
+            "Preferred Foot",
+            preferred_feet,
+            default=[],
+            help="Filter by the player's preferred foot (left, right, both)."
+        )
 
-    for metric in advanced_metric_columns:
-        if metric in df.columns and pd.api.types.is_numeric_dtype(df[metric]) and not df[metric].empty:
-            min_val = float(df[metric].min())
-            max_val = float(df[metric].max())
-            step = 0.01 if max_val - min_val < 5 else 0.1
-            if metric.endswith('_perc'):
-                step = 1.0
+        # Age filter
+        min_age_val, max_age_val = filter_options['age_bounds']
+        age_range = st.slider(
+            "Age Range",
+            min_age_val, max_age_val,
+            (min_age_val, max_age_val),
+            help="Filter players by their age."
+        )
+        slider_defaults['age_range'] = (min_age_val, max_age_val)
+
+        # Minutes played filter
+        min_minutes, max_minutes = 0, 0
+        if filter_options['minutes_bounds']:
+            min_minutes, max_minutes = filter_options['minutes_bounds']
+            minutes_range = st.slider(
+                "Minutes Played (Season)",
+                min_minutes, max_minutes,
+                (min_minutes, max_minutes),
+                help="Filter players by total minutes played in the season."
+            )
+        else:
+            minutes_range = (0, 0)
+            st.info("Minutes Played data not available.")
+        slider_defaults['minutes_range'] = (min_minutes, max_minutes)
+
+        # Contract Expiration Filter
+        if filter_options['contract_year_bounds']:
+            min_contract_year, max_contract_year = filter_options['contract_year_bounds']
+            contract_year_range = st.slider(
+                "Contract Expiration Year",
+                min_contract_year, max_contract_year,
+                (min_contract_year, max_contract_year),
+                help="Filter players by the year their contract expires."
+            )
+            slider_defaults['contract_year_range'] = (min_contract_year, max_contract_year)
+        else:
+            contract_year_range = (0, 0)
+            slider_defaults['contract_year_range'] = contract_year_range
+            st.info("Contract Expiration data not available.")
+
+        # Market Value Filter
+        if filter_options['market_value_bounds']:
+            min_value, max_value = filter_options['market_value_bounds']
+            slider_max_value = max(int(max_value * 1.2), 1000000)
+
+            market_value_range = st.slider(
+                "Market Value (€)",
+                0, slider_max_value,
+                (min_value, max_value),
+                format="€%d",
+                help="Filter players by their estimated market value in Euros."
+            )
+            slider_defaults['market_value_range'] = (min_value, max_value)
+        else:
+            market_value_range = (0, 0)
+            slider_defaults['market_value_range'] = market_value_range
+            st.info("Market Value data not available.")
+
+        # Performance Metric filters
+        metric_ranges = {}
+        st.markdown("### Performance Metrics (per 90 & Percentages)")
+
+        for metric in ADVANCED_METRIC_COLUMNS:
+            metric_bounds = filter_options['metric_bounds'][metric]
+            if metric_bounds is not None:
+                min_val, max_val = metric_bounds
+                step = 0.01 if max_val - min_val < 5 else 0.1
+                if metric.endswith('_perc'):
+                    step = 1.0
+                    min_val = max(0.0, min_val)
+                    max_val = min(100.0, max_val)
+
+                # Calculate and constrain values
                 min_val = max(0.0, min_val)
                 max_val = min(100.0, max_val)
-
-            # Calculate and constrain values
-            min_val = max(0.0, min_val)
-            max_val = min(100.0, max_val)
-            
-            # Check if slider can be created
-            if min_val >= max_val:
-                st.warning(f"Cannot create slider for {metric}: min and max values are the same ({min_val}). Skipping.")
-                continue  # Skip this iteration if inside a loop
+        
+                # Check if slider can be created
+                if min_val >= max_val:
+                    st.warning(f"Cannot create slider for {metric}: min and max values are the same ({min_val}). Skipping.")
+                    continue  # Skip this iteration if inside a loop
+                else:
+                    values = st.slider(
+                        metric_label(metric),
+                        float(f"{min_val:.2f}"),
+                        float(f"{max_val:.2f}"),
+                        (float(f"{min_val:.2f}"), float(f"{max_val:.2f}")),
+                    )
+                    slider_defaults['metric_ranges'][metric] = (float(f"{min_val:.2f}"), float(f"{max_val:.2f}"))
+
+                metric_ranges[metric] = values
             else:
-                values = st.sidebar.slider(
-                    f"{metric.replace('_', ' ').replace('per 90', '/90').replace('per90', '/90')}",
-                    float(f"{min_val:.2f}"),
-                    float(f"{max_val:.2f}"),
-                    (float(f"{min_val:.2f}"), float(f"{max_val:.2f}")),
-                )
+                st.info(f"{metric_label(metric)} data not available for filtering.")
 
-            metric_ranges[metric] = values
-        else:
-            st.sidebar.info(f"{metric.replace('_', ' ').replace('per 90', '/90').replace('perc', '%')} data not available for filtering.")
+        st.form_submit_button("Apply Filters", type="primary")
 
     # Sorting options
     st.sidebar.markdown("### Sorting Options")
@@ -308,7 +850,7 @@ def main():
         'pass_accuracy_perc', 'successful_dribbles_perc', 'shots_per_90', 'key_passes_per_90',
         'interceptions_per_90', 'tackles_per_90'
     ]
-    sort_options_list = [col for col in sort_options_list if col in df.columns and (pd.api.types.is_numeric_dtype(df[col]) or col == 'player_name')]
+    sort_options_list = [col for col in sort_options_list if col in numeric_columns or (col == 'player_name' and col in df.columns)]
 
     sort_by = st.sidebar.selectbox(
         "Sort by",
@@ -351,83 +893,56 @@ def main():
         'sort_asc': sort_asc
     }
 
-    # Apply filters
-    filtered_df = df.copy()
-
-    if filters.get('positions'):
-        filtered_df = filtered_df[filtered_df['position'].isin(filters['positions'])]
-    if filters.get('teams'):
-        filtered_df = filtered_df[filtered_df['team'].isin(filters['teams'])]
-    if filters.get('leagues'):
-        filtered_df = filtered_df[filtered_df['league'].isin(filters['leagues'])]
-    if filters.get('nationalities'):
-        filtered_df = filtered_df[filtered_df['passport_country'].isin(filters['nationalities'])]
-    if filters.get('preferred_foot'):
-        filtered_df = filtered_df[filtered_df['preferred_foot'].isin(filters['preferred_foot'])]
-
-    if 'age' in filtered_df.columns and filters.get('age_range'):
-        filtered_df = filtered_df[
-            (filtered_df['age'] >= filters['age_range'][0]) &
-            (filtered_df['age'] <= filters['age_range'][1])
-        ]
-    if 'minutes_played_total' in filtered_df.columns and filters.get('minutes_range'):
-        filtered_df = filtered_df[
-            (filtered_df['minutes_played_total'] >= filters['minutes_range'][0]) &
-            (filtered_df['minutes_played_total'] <= filters['minutes_range'][1])
-        ]
-    if 'contract_expires_year' in filtered_df.columns and filters.get('contract_year_range'):
-        filtered_df = filtered_df[
-            (filtered_df['contract_expires_year'] >= filters['contract_year_range'][0]) &
-            (filtered_df['contract_expires_year'] <= filters['contract_year_range'][1])
-        ]
-    if 'market_value_eur' in filtered_df.columns and filters.get('market_value_range'):
-        filtered_df = filtered_df[
-            (filtered_df['market_value_eur'] >= filters['market_value_range'][0]) &
-            (filtered_df['market_value_eur'] <= filters['market_value_range'][1])
-        ]
-
-    for metric, (min_val, max_val) in filters.get('metric_ranges', {}).items():
-        if metric in filtered_df.columns:
-            filtered_df = filtered_df[
-                (filtered_df[metric] >= min_val) &
-                (filtered_df[metric] <= max_val)
-            ]
-
-    if filters.get('sort_by') and filters['sort_by'] in filtered_df.columns:
-        filtered_df = filtered_df.sort_values(
-            by=filters['sort_by'],
-            ascending=filters.get('sort_asc', False)
-        )
+    # Apply all filters through one fused mask, gathering the matching rows once by
+    # position (no copy of df beforehand, and no boolean re-alignment on the index).
+    # Filters left at their defaults are dropped, and when none remain there is
+    # nothing to mask: use df as-is. The matching positions are cached per filter
+    # state, so reruns that only change the sort order or the tab skip the mask.
+    active_filters = get_active_filters(filters, slider_defaults)
+    row_positions = get_filtered_positions(db_file_path, db_mtime, active_filters) if active_filters else None
+
+    # The full frame is sorted once per column and direction; the filtered rows are
+    # picked out of that cached order, so sorting and gathering share a single iloc
+    if filters.get('sort_by') and filters['sort_by'] in df.columns:
+        order = get_sort_order(db_file_path, db_mtime, filters['sort_by'], filters.get('sort_asc', False))
+        if row_positions is not None:
+            keep = np.zeros(len(df), dtype=bool)
+            keep[row_positions] = True
+            order = order[keep[order]]
+        filtered_df = df.iloc[order]
+    elif row_positions is not None:
+        filtered_df = df.iloc[row_positions]
+    else:
+        filtered_df = df
 
     # Display summary stats
+    means = get_summary_means(db_file_path, db_mtime, active_filters)
     st.markdown(f"""
     <div style="background-color:#e6f7ff;padding:15px;border-left:5px solid #4f8bf9;border-radius:5px;margin-bottom:20px;">
         <h4 style="margin:0;color:#0056b3;">📊 Search Results Summary: <span style="color:#28a745;">{len(filtered_df)}</span> Players Found</h4>
         <div style="display:flex;justify-content:space-around;flex-wrap:wrap;margin-top:10px;">
-            <div style="margin:5px 15px;"><strong>Avg. Age:</strong> {safe_mean(filtered_df.get('age', pd.Series()), '.1f')}</div>
-            <div style="margin:5px 15px;"><strong>Avg. Mins Played:</strong> {safe_mean(filtered_df.get('minutes_played_total', pd.Series()), 'd')}</div>
-            <div style="margin:5px 15px;"><strong>Avg. Goals/90:</strong> {safe_mean(filtered_df.get('goals_per_90', pd.Series()))}</div>
-            <div style="margin:5px 15px;"><strong>Avg. xG/90:</strong> {safe_mean(filtered_df.get('xg_per_90', pd.Series()))}</div>
-            <div style="margin:5px 15px;"><strong>Avg. Assists/90:</strong> {safe_mean(filtered_df.get('assists_per_90', pd.Series()))}</div>
-            <div style="margin:5px 15px;"><strong>Avg. xA/90:</strong> {safe_mean(filtered_df.get('xa_per_90', pd.Series()))}</div>
+            <div style="margin:5px 15px;"><strong>Avg. Age:</strong> {safe_mean(means, 'age', '.1f')}</div>
+            <div style="margin:5px 15px;"><strong>Avg. Mins Played:</strong> {safe_mean(means, 'minutes_played_total', '.0f')}</div>
+            <div style="margin:5px 15px;"><strong>Avg. Goals/90:</strong> {safe_mean(means, 'goals_per_90')}</div>
+            <div style="margin:5px 15px;"><strong>Avg. xG/90:</strong> {safe_mean(means, 'xg_per_90')}</div>
+            <div style="margin:5px 15px;"><strong>Avg. Assists/90:</strong> {safe_mean(means, 'assists_per_90')}</div>
+            <div style="margin:5px 15px;"><strong>Avg. xA/90:</strong> {safe_mean(means, 'xa_per_90')}</div>
         </div>
     </div>
     """, unsafe_allow_html=True)
 
-    tab1, tab2, tab3 = st.tabs(["📋 Player List", "👤 Player Profiles", "📈 Advanced Analytics"])
+    # Switching tabs reruns the script, and the profile and analytics tabs only run their radar
+    # and chart work while open. The player list always renders so the grid keeps its selection,
+    # page and in-grid sort/filter state (it only reruns the app on a row selection)
+    tab1, tab2, tab3 = st.tabs(
+        ["📋 Player List", "👤 Player Profiles", "📈 Advanced Analytics"],
+        key='main_tabs', on_change='rerun'
+    )
 
     with tab1:
         st.header("Player List")
         st.write("Browse and filter players. Select a row to view the player's detailed profile in the 'Player Profiles' tab.")
 
-        gb = GridOptionsBuilder.from_dataframe(filtered_df)
-
-        gb.configure_default_column(
-            groupable=True, sortable=True, resizable=True, filterable=True,
-            editable=False, wrapText=True, width=150
-        )
-        gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=25)
-
         display_cols = [
             'player_name', 'position', 'team', 'league', 'age', 'minutes_played_total',
             'goals_total', 'assists_total', 'goals_per_90', 'xg_per_90', 'assists_per_90', 'xa_per_90',
@@ -437,319 +952,259 @@ def main():
             'contract_expires_year', 'market_value_eur'
         ]
 
-        for col in filtered_df.columns:
-            if col not in display_cols:
-                gb.configure_column(col, hide=True)
-
-        for col_name in display_cols:
-            if col_name in filtered_df.columns:
-                header_name = col_name.replace('_', ' ').replace('perc', '%').replace('total', '(Total)').replace('per 90', '/90')
-                if col_name.endswith('_per_90') or col_name in ['xg', 'xa', 'shots_per_90']:
-                    gb.configure_column(col_name, type=["numericColumn", "numberColumnFilter"],
-                                        valueFormatter=JsCode("function(params) { return params.value != null ? params.value.toFixed(2) : 'N/A'; }").js_code,
-                                        headerName=header_name)
-                elif col_name.endswith('_perc'):
-                    gb.configure_column(col_name, type=["numericColumn", "numberColumnFilter"],
-                                        valueFormatter=JsCode("function(params) { return params.value != null ? params.value.toFixed(1) + '%' : 'N/A'; }").js_code,
-                                        headerName=header_name)
-                elif col_name == 'market_value_eur':
-                    gb.configure_column(col_name, type=["numericColumn", "numberColumnFilter"],
-                                        valueFormatter=JsCode("function(params) { return params.value != null ? '€' + params.value.toLocaleString() : 'N/A'; }").js_code,
-                                        headerName="Market Value (€)")
-                elif col_name in ['player_name', 'position', 'team', 'league', 'passport_country', 'preferred_foot']:
-                    gb.configure_column(col_name, headerName=header_name, width=150, sortable=True, filterable=True)
-                elif col_name in ['age', 'minutes_played_total', 'goals_total', 'assists_total', 'height', 'weight', 'contract_expires_year']:
-                    gb.configure_column(col_name, type=["numericColumn", "numberColumnFilter"],
-                                        valueFormatter=JsCode("function(params) { return params.value != null ? Math.round(params.value) : 'N/A'; }").js_code,
-                                        headerName=header_name)
-                else:
-                    gb.configure_column(col_name, headerName=header_name)
+        # The grid only receives the displayed columns; hidden columns would still be serialized and shipped
+        grid_df = filtered_df[[col for col in display_cols if col in filtered_df.columns]]
 
-        gb.configure_selection('single', use_checkbox=True, groupSelectsChildren=True)
-        grid_options = gb.build()
+        # AgGrid sets top-level keys on the options it is given, so hand it a copy of the shared dict
+        grid_options = dict(build_grid_options(grid_df.head(0)))
 
+        # Only a row selection matters to the app: in-grid sorting and filtering stay in the
+        # browser instead of sending every row back and rerunning the whole script
         grid_response = AgGrid(
-            filtered_df, gridOptions=grid_options, height=600, width='100%',
-            theme='streamlit', enable_enterprise_modules=False, update_mode='MODEL_CHANGED',
+            grid_df, gridOptions=grid_options, height=600, width='100%',
+            theme='streamlit', enable_enterprise_modules=False, update_on=['selectionChanged'],
             fit_columns_on_grid_load=False, key='players_grid'
         )
 
-        selected_players_from_grid = grid_response.get('selected_rows', [])
-        if selected_players_from_grid:
-            st.session_state['selected_player_for_profile_tab'] = selected_players_from_grid[0]['player_name']
+        # selected_rows is a DataFrame of the selected rows, or None before any selection
+        selected_players_from_grid = grid_response.get('selected_rows')
+        if selected_players_from_grid is not None and len(selected_players_from_grid) > 0:
+            st.session_state['selected_player_for_profile_tab'] = selected_players_from_grid['player_name'].iloc[0]
         elif 'selected_player_for_profile_tab' not in st.session_state:
             st.session_state['selected_player_for_profile_tab'] = None
 
+        # The files are encoded only when a button is clicked, never on a plain rerun; they carry
+        # every table column, taking the filtered rows (df positions, in sort order) from the export table
+        export_positions = filtered_df.index.to_numpy()
         st.download_button(
             "💾 Download Filtered Data (CSV)",
-            filtered_df.to_csv(index=False).encode('utf-8'),
+            lambda: to_csv_bytes(get_export_table(db_file_path, db_mtime).iloc[export_positions]),
             "filtered_players.csv", "text/csv", key='download-csv'
         )
+        st.download_button(
+            "💾 Download Filtered Data (Parquet)",
+            lambda: to_parquet_bytes(get_export_table(db_file_path, db_mtime).iloc[export_positions]),
+            "filtered_players.parquet", "application/octet-stream", key='download-parquet'
+        )
 
     with tab2:
-        st.header("Player Profiles")
-        st.write("View detailed statistics and performance insights for a selected player.")
+        if tab2.open:
+            st.header("Player Profiles")
+            st.write("View detailed statistics and performance insights for a selected player.")
 
-        if filtered_df.empty:
-            st.warning("No players match your filters. Adjust filters to see profiles.")
-        else:
-            player_names = filtered_df['player_name'].unique()
-
-            default_player_index = 0
-            if st.session_state.get('selected_player_for_profile_tab') and \
-               st.session_state['selected_player_for_profile_tab'] in player_names:
-                default_player_index = list(player_names).index(st.session_state['selected_player_for_profile_tab'])
-            elif player_names.size > 0:
-                st.session_state['selected_player_for_profile_tab'] = player_names[0]
-                default_player_index = 0
+            if filtered_df.empty:
+                st.warning("No players match your filters. Adjust filters to see profiles.")
             else:
-                st.session_state['selected_player_for_profile_tab'] = None
+                # Each distinct name with the position of its first row; looking a player up is then a dict hit
+                first_rows = np.flatnonzero(~filtered_df['player_name'].duplicated().to_numpy())
+                player_names = filtered_df['player_name'].to_numpy()[first_rows]
+                player_index = {name: i for i, name in enumerate(player_names)}
+
                 default_player_index = 0
+                if st.session_state.get('selected_player_for_profile_tab') and \
+                   st.session_state['selected_player_for_profile_tab'] in player_index:
+                    default_player_index = player_index[st.session_state['selected_player_for_profile_tab']]
+                elif player_names.size > 0:
+                    st.session_state['selected_player_for_profile_tab'] = player_names[0]
+                    default_player_index = 0
+                else:
+                    st.session_state['selected_player_for_profile_tab'] = None
+                    default_player_index = 0
 
-            selected_player = st.selectbox(
-                "Select a player to view detailed profile:",
-                player_names, index=default_player_index, key='player_profile_selector'
-            )
+                selected_player = st.selectbox(
+                    "Select a player to view detailed profile:",
+                    player_names, index=default_player_index, key='player_profile_selector'
+                )
 
-            if selected_player:
-                player_data = filtered_df[filtered_df['player_name'] == selected_player].iloc[0]
-
-                st.markdown(f"<h3 id='player-profile-{selected_player.replace(' ', '-')}' style='color:#4f8bf9;'>{player_data['player_name']}</h3>", unsafe_allow_html=True)
-                st.markdown(f"**Position:** {player_data.get('position', 'N/A')} | **Team:** {player_data.get('team', 'N/A')} | **League:** {player_data.get('league', 'N/A')}")
-                st.markdown(f"**Nationality:** {player_data.get('Passport country', 'N/A')} | **Preferred Foot:** {player_data.get('preferred_foot', 'N/A')}")
-                st.markdown(f"**Age:** {int(player_data.get('age', 0))} | **Height:** {int(player_data.get('height', 0))} cm | **Weight:** {int(player_data.get('weight', 0))} kg")
-                market_value_display = f"€{player_data.get('market_value_eur', 0):,.0f}" if player_data.get('market_value_eur') else 'N/A'
-                st.markdown(f"**Contract Expires:** {player_data.get('contract_expires_year', 'N/A')} | **Market Value:** {market_value_display}")
-
-                st.markdown("---")
-
-                st.subheader("Performance Radar Chart")
-                st.write("Compares the player's key per 90 metrics against the average of all currently filtered players in their primary position.")
-
-                position_filtered_df = filtered_df[filtered_df['position'] == player_data['position']]
-                if not position_filtered_df.empty:
-                    radar_metrics = [
-                        'goals_per_90', 'xg_per_90', 'assists_per_90', 'xa_per_90',
-                        'shots_per_90', 'key_passes_per_90', 'dribbles_attempted_per_90',
-                        'interceptions_per_90', 'tackles_per_90', 'aerial_duels_won_perc'
-                    ]
-                    radar_metrics = [m for m in radar_metrics if m in position_filtered_df.columns and pd.api.types.is_numeric_dtype(position_filtered_df[m])]
-
-                    if radar_metrics:
-                        player_values = [player_data.get(m, 0) for m in radar_metrics]
-                        avg_values = [position_filtered_df[m].mean() for m in radar_metrics]
-
-                        max_values = [position_filtered_df[m].max() for m in radar_metrics]
-                        max_values = [mv if mv > 0 else 1 for mv in max_values]
-
-                        player_scaled = [val / mx if mx > 0 else 0 for val, mx in zip(player_values, max_values)]
-                        avg_scaled = [val / mx if mx > 0 else 0 for val, mx in zip(avg_values, max_values)]
-
-                        fig_radar = go.Figure()
-                        fig_radar.add_trace(go.Scatterpolar(
-                            r=player_scaled,
-                            theta=[m.replace('_', ' ').replace('per 90', '/90').replace('perc', '%') for m in radar_metrics],
-                            fill='toself', name=player_data['player_name'], marker_color='blue', opacity=0.7
-                        ))
-                        fig_radar.add_trace(go.Scatterpolar(
-                            r=avg_scaled,
-                            theta=[m.replace('_', ' ').replace('per 90', '/90').replace('perc', '%') for m in radar_metrics],
-                            fill='toself', name=f'Avg. {player_data["position"]}', marker_color='red', opacity=0.4
-                        ))
-                        fig_radar.update_layout(
-                            polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
-                            showlegend=True,
-                            title=f"Performance Comparison: {player_data['player_name']} vs. Avg. {player_data['position']}"
-                        )
-                        st.plotly_chart(fig_radar, use_container_width=True)
+                if selected_player:
+                    player_data = filtered_df.iloc[first_rows[player_index[selected_player]]]
+
+                    st.markdown(f"<h3 id='player-profile-{selected_player.replace(' ', '-')}' style='color:#4f8bf9;'>{player_data['player_name']}</h3>", unsafe_allow_html=True)
+                    st.markdown(f"**Position:** {player_data.get('position', 'N/A')} | **Team:** {player_data.get('team', 'N/A')} | **League:** {player_data.get('league', 'N/A')}")
+                    st.markdown(f"**Nationality:** {player_data.get('passport_country', 'N/A')} | **Preferred Foot:** {player_data.get('preferred_foot', 'N/A')}")
+                    st.markdown(f"**Age:** {int(player_data.get('age', 0))} | **Height:** {int(player_data.get('height', 0))} cm | **Weight:** {int(player_data.get('weight', 0))} kg")
+                    market_value_display = f"€{player_data.get('market_value_eur', 0):,.0f}" if player_data.get('market_value_eur') else 'N/A'
+                    st.markdown(f"**Contract Expires:** {player_data.get('contract_expires_year', 'N/A')} | **Market Value:** {market_value_display}")
+
+                    st.markdown("---")
+
+                    st.subheader("Performance Radar Chart")
+                    st.write("Compares the player's key per 90 metrics against the average of all currently filtered players in their primary position.")
+
+                    radar_metrics = [m for m in RADAR_METRICS if m in numeric_columns]
+                    radar_stats = get_position_radar_stats(db_file_path, db_mtime, active_filters, tuple(radar_metrics))
+                    if player_data['position'] in radar_stats:
+                        if radar_metrics:
+                            # Scale every metric by the position maximum; switching players is a dict lookup
+                            avg_values, max_values = radar_stats[player_data['position']]
+                            max_values = np.where(max_values > 0, max_values, 1)
+                            player_values = player_data[radar_metrics].to_numpy(dtype=np.float64)
+
+                            player_scaled = player_values / max_values
+                            avg_scaled = avg_values / max_values
+                            radar_labels = [metric_label(m) for m in radar_metrics]
+
+                            fig_radar = go.Figure()
+                            fig_radar.add_trace(go.Scatterpolar(
+                                r=player_scaled,
+                                theta=radar_labels,
+                                fill='toself', name=player_data['player_name'], marker_color='blue', opacity=0.7
+                            ))
+                            fig_radar.add_trace(go.Scatterpolar(
+                                r=avg_scaled,
+                                theta=radar_labels,
+                                fill='toself', name=f'Avg. {player_data["position"]}', marker_color='red', opacity=0.4
+                            ))
+                            fig_radar.update_layout(
+                                polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
+                                showlegend=True,
+                                title=f"Performance Comparison: {player_data['player_name']} vs. Avg. {player_data['position']}"
+                            )
+                            st.plotly_chart(fig_radar, use_container_width=True)
+                        else:
+                            st.info("Insufficient numeric data for radar chart from the selected metrics.")
                     else:
-                        st.info("Insufficient numeric data for radar chart from the selected metrics.")
-                else:
-                    st.info(f"Not enough players in {player_data['position']} to generate a meaningful comparison radar chart from the filtered data.")
-
-                st.subheader("Key Performance Metrics")
-                cols_general = st.columns(4)
-                cols_general[0].metric("Age", int(player_data.get('age', 0)))
-                cols_general[1].metric("Minutes Played", int(player_data.get('minutes_played_total', 0)))
-                cols_general[2].metric("Height (cm)", int(player_data.get('height', 0)))
-                cols_general[3].metric("Weight (kg)", int(player_data.get('weight', 0)))
-
-                st.markdown("#### Attacking")
-                cols_att = st.columns(4)
-                cols_att[0].metric("Goals (Total)", int(player_data.get('goals_total', 0)))
-                cols_att[1].metric("xG (Total)", f"{player_data.get('xg', 0):.2f}")
-                cols_att[2].metric("Assists (Total)", int(player_data.get('assists_total', 0)))
-                cols_att[3].metric("xA (Total)", f"{player_data.get('xa', 0):.2f}")
-
-                cols_att_p90 = st.columns(4)
-                cols_att_p90[0].metric("Goals/90", f"{player_data.get('goals_per_90', 0):.2f}")
-                cols_att_p90[1].metric("xG/90", f"{player_data.get('xg_per_90', 0):.2f}")
-                cols_att_p90[2].metric("Assists/90", f"{player_data.get('assists_per_90', 0):.2f}")
-                cols_att_p90[3].metric("xA/90", f"{player_data.get('xa_per_90', 0):.2f}")
-
-                cols_att_detail = st.columns(4)
-                cols_att_detail[0].metric("Shots/90", f"{player_data.get('shots_per_90', 0):.2f}")
-                cols_att_detail[1].metric("Shots on Target %", f"{player_data.get('shots_on_target_perc', 0):.1f}%")
-                cols_att_detail[2].metric("Key Passes/90", f"{player_data.get('key_passes_per_90', 0):.2f}")
-                cols_att_detail[3].metric("Touches in Box/90", f"{player_data.get('touches_in_box_per_90', 0):.2f}")
-
-                st.markdown("#### Passing & Ball Progression")
-                cols_pass = st.columns(3)
-                cols_pass[0].metric("Total Passes/90", f"{player_data.get('passes_per_90', 0):.2f}")
-                cols_pass[1].metric("Accurate Passes/90", f"{player_data.get('accurate_passes_per_90', 0):.2f}")
-                cols_pass[2].metric("Pass Accuracy %", f"{player_data.get('pass_accuracy_perc', 0):.1f}%")
-
-                cols_prog = st.columns(2)
-                cols_prog[0].metric("Progressive Runs/90", f"{player_data.get('progressive_runs_per_90', 0):.2f}")
-                cols_prog[1].metric("Dribbles Comp. %", f"{player_data.get('successful_dribbles_perc', 0):.1f}%")
-
-                st.markdown("#### Defensive")
-                cols_def = st.columns(3)
-                cols_def[0].metric("Interceptions/90", f"{player_data.get('interceptions_per_90', 0):.2f}")
-                cols_def[1].metric("Tackles/90", f"{player_data.get('tackles_per_90', 0):.2f}")
-                cols_def[2].metric("Defensive Duels Won %", f"{player_data.get('defensive_duels_won_perc', 0):.1f}%")
-
-                cols_def_det = st.columns(2)
-                cols_def_det[0].metric("Shots Blocked/90", f"{player_data.get('shots_blocked_per_90', 0):.2f}")
-                cols_def_det[1].metric("Successful Def. Actions/90", f"{player_data.get('successful_defensive_actions_per_90', 0):.2f}")
-
-                if 'gk' in player_data.get('position', '').lower():
-                    st.markdown("#### Goalkeeping")
-                    cols_gk = st.columns(3)
-                    cols_gk[0].metric("Saves", int(player_data.get('saves', 0)))
-                    cols_gk[1].metric("Goals Conceded", int(player_data.get('conceded_goals', 0)))
-                    cols_gk[2].metric("Clean Sheets", int(player_data.get('clean_sheets', 0)))
+                        st.info(f"Not enough players in {player_data['position']} to generate a meaningful comparison radar chart from the filtered data.")
+
+                    st.subheader("Key Performance Metrics")
+                    cols_general = st.columns(4)
+                    cols_general[0].metric("Age", int(player_data.get('age', 0)))
+                    cols_general[1].metric("Minutes Played", int(player_data.get('minutes_played_total', 0)))
+                    cols_general[2].metric("Height (cm)", int(player_data.get('height', 0)))
+                    cols_general[3].metric("Weight (kg)", int(player_data.get('weight', 0)))
+
+                    st.markdown("#### Attacking")
+                    cols_att = st.columns(4)
+                    cols_att[0].metric("Goals (Total)", int(player_data.get('goals_total', 0)))
+                    cols_att[1].metric("xG (Total)", f"{player_data.get('xg', 0):.2f}")
+                    cols_att[2].metric("Assists (Total)", int(player_data.get('assists_total', 0)))
+                    cols_att[3].metric("xA (Total)", f"{player_data.get('xa', 0):.2f}")
+
+                    cols_att_p90 = st.columns(4)
+                    cols_att_p90[0].metric("Goals/90", f"{player_data.get('goals_per_90', 0):.2f}")
+                    cols_att_p90[1].metric("xG/90", f"{player_data.get('xg_per_90', 0):.2f}")
+                    cols_att_p90[2].metric("Assists/90", f"{player_data.get('assists_per_90', 0):.2f}")
+                    cols_att_p90[3].metric("xA/90", f"{player_data.get('xa_per_90', 0):.2f}")
+
+                    cols_att_detail = st.columns(4)
+                    cols_att_detail[0].metric("Shots/90", f"{player_data.get('shots_per_90', 0):.2f}")
+                    cols_att_detail[1].metric("Shots on Target %", f"{player_data.get('shots_on_target_perc', 0):.1f}%")
+                    cols_att_detail[2].metric("Key Passes/90", f"{player_data.get('key_passes_per_90', 0):.2f}")
+                    cols_att_detail[3].metric("Touches in Box/90", f"{player_data.get('touches_in_box_per_90', 0):.2f}")
+
+                    st.markdown("#### Passing & Ball Progression")
+                    cols_pass = st.columns(3)
+                    cols_pass[0].metric("Total Passes/90", f"{player_data.get('passes_per_90', 0):.2f}")
+                    cols_pass[1].metric("Accurate Passes/90", f"{player_data.get('accurate_passes_per_90', 0):.2f}")
+                    cols_pass[2].metric("Pass Accuracy %", f"{player_data.get('pass_accuracy_perc', 0):.1f}%")
+
+                    cols_prog = st.columns(2)
+                    cols_prog[0].metric("Progressive Runs/90", f"{player_data.get('progressive_runs_per_90', 0):.2f}")
+                    cols_prog[1].metric("Dribbles Comp. %", f"{player_data.get('successful_dribbles_perc', 0):.1f}%")
+
+                    st.markdown("#### Defensive")
+                    cols_def = st.columns(3)
+                    cols_def[0].metric("Interceptions/90", f"{player_data.get('interceptions_per_90', 0):.2f}")
+                    cols_def[1].metric("Tackles/90", f"{player_data.get('tackles_per_90', 0):.2f}")
+                    cols_def[2].metric("Defensive Duels Won %", f"{player_data.get('defensive_duels_won_perc', 0):.1f}%")
+
+                    cols_def_det = st.columns(2)
+                    cols_def_det[0].metric("Shots Blocked/90", f"{player_data.get('shots_blocked_per_90', 0):.2f}")
+                    cols_def_det[1].metric("Successful Def. Actions/90", f"{player_data.get('successful_defensive_actions_per_90', 0):.2f}")
+
+                    if 'gk' in player_data.get('position', '').lower():
+                        st.markdown("#### Goalkeeping")
+                        cols_gk = st.columns(3)
+                        cols_gk[0].metric("Saves", int(player_data.get('saves', 0)))
+                        cols_gk[1].metric("Goals Conceded", int(player_data.get('conceded_goals', 0)))
+                        cols_gk[2].metric("Clean Sheets", int(player_data.get('clean_sheets', 0)))
 
     with tab3:
-        st.header("Advanced Analytics & Visualizations")
-        st.write("Explore trends and relationships within the filtered player dataset.")
+        if tab3.open:
+            st.header("Advanced Analytics & Visualizations")
+            st.write("Explore trends and relationships within the filtered player dataset.")
 
-        if filtered_df.empty:
-            st.warning("No players match your filters. Adjust filters to see analytics.")
-        else:
-            st.subheader("League Performance Overview")
-
-            if 'league' in filtered_df.columns and not filtered_df.empty:
-                col1, col2 = st.columns(2)
-
-                agg_metrics = {
-                    'age': 'mean',
-                    'goals_per_90': 'mean',
-                    'assists_per_90': 'mean',
-                    'xg_per_90': 'mean',
-                    'xa_per_90': 'mean',
-                    'pass_accuracy_perc': 'mean',
-                    'successful_dribbles_perc': 'mean',
-                    'interceptions_per_90': 'mean',
-                    'tackles_per_90': 'mean'
-                }
-                existing_agg_metrics = {k: v for k, v in agg_metrics.items() if k in filtered_df.columns}
-
-                if existing_agg_metrics:
-                    league_stats = filtered_df.groupby('league').agg(existing_agg_metrics).reset_index()
-
-                    with col1:
-                        if 'goals_per_90' in league_stats.columns:
-                            fig_goals = px.bar(
-                                league_stats.sort_values('goals_per_90', ascending=False),
-                                x='goals_per_90',
-                                y='league',
-                                orientation='h',
-                                title='Average Goals per 90 by League',
-                                color='goals_per_90',
-                                color_continuous_scale=px.colors.sequential.Plasma
-                            )
-                            fig_goals.update_layout(yaxis={'categoryorder':'total ascending'})
-                            st.plotly_chart(fig_goals, use_container_width=True)
-                        else:
-                            st.info("Goals per 90 data not available for league comparison.")
-
-                    with col2:
-                        if 'assists_per_90' in league_stats.columns:
-                            fig_assists = px.bar(
-                                league_stats.sort_values('assists_per_90', ascending=False),
-                                x='assists_per_90',
-                                y='league',
-                                orientation='h',
-                                title='Average Assists per 90 by League',
-                                color='assists_per_90',
-                                color_continuous_scale=px.colors.sequential.Viridis
-                            )
-                            fig_assists.update_layout(yaxis={'categoryorder':'total ascending'})
-                            st.plotly_chart(fig_assists, use_container_width=True)
-                        else:
-                            st.info("Assists per 90 data not available for league comparison.")
-                else:
-                    st.info("No suitable numeric metrics found for league aggregation.")
+            if filtered_df.empty:
+                st.warning("No players match your filters. Adjust filters to see analytics.")
             else:
-                st.info("No 'league' column or data available for league analytics.")
-
-            st.subheader("Player Performance Distribution")
-            distribution_options = [
-                m for m in advanced_metric_columns + ['age', 'minutes_played_total', 'market_value_eur', 'height', 'weight']
-                if m in filtered_df.columns and pd.api.types.is_numeric_dtype(filtered_df[m])
-            ]
-            display_distribution_options = [opt.replace('_', ' ').replace('perc', '%').replace('per 90', '/90') for opt in distribution_options]
-            selected_dist_metric_display = st.selectbox(
-                "Select a metric to view its distribution:",
-                options=display_distribution_options,
-                key='dist_metric_selector'
-            )
-            selected_dist_metric = distribution_options[display_distribution_options.index(selected_dist_metric_display)]
-
-            if selected_dist_metric and selected_dist_metric in filtered_df.columns:
-                fig_hist = px.histogram(
-                    filtered_df, x=selected_dist_metric, nbins=20,
-                    title=f'Distribution of {selected_dist_metric_display}',
-                    marginal="rug", hover_data=['player_name', 'team', 'position', 'age']
+                st.subheader("League Performance Overview")
+
+                if 'league' in filtered_df.columns and not filtered_df.empty:
+                    col1, col2 = st.columns(2)
+
+                    league_stats = get_league_stats(db_file_path, db_mtime, active_filters)
+
+                    if league_stats is not None:
+                        with col1:
+                            if 'goals_per_90' in league_stats.columns:
+                                fig_goals = px.bar(
+                                    league_stats.sort_values('goals_per_90', ascending=False),
+                                    x='goals_per_90',
+                                    y='league',
+                                    orientation='h',
+                                    title='Average Goals per 90 by League',
+                                    color='goals_per_90',
+                                    color_continuous_scale=px.colors.sequential.Plasma
+                                )
+                                fig_goals.update_layout(yaxis={'categoryorder':'total ascending'})
+                                st.plotly_chart(fig_goals, use_container_width=True)
+                            else:
+                                st.info("Goals per 90 data not available for league comparison.")
+
+                        with col2:
+                            if 'assists_per_90' in league_stats.columns:
+                                fig_assists = px.bar(
+                                    league_stats.sort_values('assists_per_90', ascending=False),
+                                    x='assists_per_90',
+                                    y='league',
+                                    orientation='h',
+                                    title='Average Assists per 90 by League',
+                                    color='assists_per_90',
+                                    color_continuous_scale=px.colors.sequential.Viridis
+                                )
+                                fig_assists.update_layout(yaxis={'categoryorder':'total ascending'})
+                                st.plotly_chart(fig_assists, use_container_width=True)
+                            else:
+                                st.info("Assists per 90 data not available for league comparison.")
+                    else:
+                        st.info("No suitable numeric metrics found for league aggregation.")
+                else:
+                    st.info("No 'league' column or data available for league analytics.")
+
+                st.subheader("Player Performance Distribution")
+                distribution_labels = filter_options['distribution_labels']
+                selected_dist_metric = st.selectbox(
+                    "Select a metric to view its distribution:",
+                    options=list(distribution_labels),
+                    format_func=distribution_labels.get,
+                    key='dist_metric_selector'
                 )
-                st.plotly_chart(fig_hist, use_container_width=True)
-            else:
-                st.info("No data for the selected distribution metric.")
-
-            st.subheader("Player Comparison Scatter Plot")
-            st.write("Identify player archetypes by comparing two key performance metrics.")
-
-            col_x, col_y = st.columns(2)
-            scatter_options = [
-                m for m in advanced_metric_columns + ['pass_accuracy_perc', 'successful_dribbles_perc', 'age', 'minutes_played_total', 'market_value_eur', 'height', 'weight']
-                if m in filtered_df.columns and pd.api.types.is_numeric_dtype(filtered_df[m])
-            ]
-
-            display_scatter_options = [opt.replace('_', ' ').replace('perc', '%').replace('per 90', '/90') for opt in scatter_options]
+                selected_dist_metric_display = distribution_labels.get(selected_dist_metric)
+
+                if selected_dist_metric and selected_dist_metric in filtered_df.columns:
+                    # Bin in NumPy and ship 20 bars instead of every row; the rug above shows a sample of players
+                    counts, edges = np.histogram(filtered_df[selected_dist_metric].to_numpy(), bins=20)
+                    fig_hist = go.Figure(go.Bar(
+                        x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                        name='count', hovertemplate='%{x}: %{y}<extra></extra>'
+                    ))
+                    rug_df = filtered_df.sample(n=min(RUG_SAMPLE_SIZE, len(filtered_df)), random_state=0)
+                    fig_hist.add_trace(go.Scatter(
+                        x=rug_df[selected_dist_metric], y=np.zeros(len(rug_df)), yaxis='y2', mode='markers',
+                        marker=dict(symbol='line-ns-open', size=10), name='players',
+                        customdata=rug_df[['player_name', 'team', 'position', 'age']].astype(str).to_numpy(),
+                        hovertemplate='%{customdata[0]}<br>%{customdata[1]} | %{customdata[2]} | Age %{customdata[3]}<br>%{x}<extra></extra>'
+                    ))
+                    fig_hist.update_layout(
+                        title=f'Distribution of {selected_dist_metric_display}', showlegend=False, bargap=0,
+                        xaxis_title=selected_dist_metric, yaxis=dict(title='count', domain=[0, 0.8]),
+                        yaxis2=dict(domain=[0.82, 1], visible=False)
+                    )
+                    st.plotly_chart(fig_hist, use_container_width=True)
+                else:
+                    st.info("No data for the selected distribution metric.")
 
-            x_axis_metric_display = col_x.selectbox(
-                "X-Axis Metric:",
-                options=display_scatter_options,
-                index=display_scatter_options.index('xg /90') if 'xg /90' in display_scatter_options else 0,
-                key='x_axis_metric'
-            )
-            y_axis_metric_display = col_y.selectbox(
-                "Y-Axis Metric:",
-                options=display_scatter_options,
-                index=display_scatter_options.index('xa /90') if 'xa /90' in display_scatter_options else (1 if len(display_scatter_options)>1 else 0),
-                key='y_axis_metric'
-            )
-            x_axis_metric = scatter_options[display_scatter_options.index(x_axis_metric_display)]
-            y_axis_metric = scatter_options[display_scatter_options.index(y_axis_metric_display)]
-
-            if x_axis_metric and y_axis_metric and not filtered_df.empty:
-                fig_scatter = px.scatter(
-                    filtered_df,
-                    x=x_axis_metric, y=y_axis_metric,
-                    hover_name="player_name",
-                    hover_data=['team', 'position', 'age', 'minutes_played_total', 'market_value_eur'],
-                    color='position',
-                    size='market_value_eur' if 'market_value_eur' in filtered_df.columns else None,
-                    title=f'{x_axis_metric_display} vs. {y_axis_metric_display}'
-                )
-                fig_scatter.update_layout(
-                    xaxis_title=x_axis_metric_display,
-                    yaxis_title=y_axis_metric_display
-                )
-                st.plotly_chart(fig_scatter, use_container_width=True)
-            else:
-                st.info("Select two numeric metrics for the scatter plot.")
+                render_scatter_panel(filtered_df, db_file_path, db_mtime, active_filters)
 
 if __name__ == "__main__":
     main()